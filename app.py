@@ -1,15 +1,209 @@
 # app.py — Slide-by-Slide PPT Generator (with orientation-aware image handling)
 import streamlit as st
 from pptx import Presentation
-from pptx.util import Inches
+from pptx.util import Emu
 import os
+import atexit
+import functools
+import math
+import hashlib
+import shutil
+import struct
 import tempfile
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from PIL import Image as PILImage  # For image dimension handling
+from image_header import read_image_size
+from ppt_generator import EMBED_DPI, has_alpha, save_pptx, shrink_image
+
+EMU_PER_INCH = 914400
+
+
+# Native pixel size of an image, read from the file header only (DPI is not
+# needed: it cancels out when fitting the image into a cell).
+# `mtime` is part of the cache key so an overwritten file is re-read.
+@st.cache_data(show_spinner=False)
+def image_meta(path, mtime):
+    try:
+        size = read_image_size(path)
+    except struct.error:
+        size = None
+    if size is None:
+        # Not a JPEG/PNG we can parse by hand; PIL still only reads the header
+        with PILImage.open(path) as pil_img:
+            size = pil_img.size
+    return size
+
+
+# Small JPEG preview for the slide grid. `draft` lets libjpeg decode at a
+# reduced DCT scale, so large photos are never decoded at full resolution.
+@st.cache_data(show_spinner=False, max_entries=512)
+def thumb_for(path, mtime):
+    with PILImage.open(path) as im:
+        im.draft('RGB', (256, 256))
+        # thumbnail() rejects modes such as 16-bit "I;16", so convert first
+        if im.mode not in ('RGB', 'L', 'RGBA'):
+            im = im.convert('RGBA' if has_alpha(im) else 'RGB')
+        im.thumbnail((200, 200), PILImage.Resampling.BILINEAR)
+        if im.mode == 'RGBA':
+            # Show transparent areas as white, not black
+            background = PILImage.new('RGB', im.size, 'white')
+            background.paste(im, mask=im.getchannel('A'))
+            im = background
+        buf = BytesIO()
+        im.convert('RGB').save(buf, 'JPEG', quality=70)
+    return buf.getvalue()
+
+
+# Parent of every session's upload dir: created once per server process and
+# removed by a single atexit handler.
+@st.cache_resource(show_spinner=False)
+def upload_parent():
+    path = tempfile.mkdtemp(prefix='ppt_uploads_')
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+# A session's upload dir. It lives in st.session_state, so it is garbage-collected
+# when Streamlit drops the session, and the finalizer removes the files then.
+# Uploads therefore survive reruns and downloads for the whole session.
+class UploadDir:
+    def __init__(self, parent):
+        self.path = tempfile.mkdtemp(dir=parent)
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+        self._cleanup.atexit = False  # upload_parent() covers server shutdown
+
+
+# Stream an uploaded file into `temp_root`, named by its SHA-1 so re-uploading
+# the same photo reuses the file already on disk. Safe to call from several
+# threads: the copy goes to a private temp file that is renamed into place.
+def save_upload(f, temp_root):
+    digest = hashlib.sha1()
+    f.seek(0)
+    while chunk := f.read(1 << 20):
+        digest.update(chunk)
+    ext = os.path.splitext(f.name)[1].lower()
+    path = os.path.join(temp_root, digest.hexdigest() + ext)
+    if not os.path.exists(path):
+        f.seek(0)
+        with tempfile.NamedTemporaryFile(dir=temp_root, delete=False) as fp:
+            shutil.copyfileobj(f, fp, length=1 << 20)
+        os.replace(fp.name, path)
+    return path
+
+
+# Cell boundaries for a grid shape (sizes in inches, offsets in EMU). Only a
+# handful of shapes exist, so each is computed once per run, not per slide.
+@functools.lru_cache(maxsize=None)
+def grid_cells(rows, cols, used_rows):
+    # Slide usable area (in inches)
+    max_width = 15.0   # Approx full slide width
+    max_height = 7.5   # Leave room for title/footer if needed
+    img_width = max_width / cols
+    img_height = max_height / rows
+
+    cell_width_in = img_width - 0.3
+    cell_height_in = img_height - 0.3
+    cell_lefts_emu = tuple(int((c * img_width + 0.15) * EMU_PER_INCH) for c in range(cols))
+    cell_tops_emu = tuple(int((r * img_height + 0.3) * EMU_PER_INCH) for r in range(used_rows))
+    return (cell_width_in, cell_height_in,
+            int(cell_width_in * EMU_PER_INCH), int(cell_height_in * EMU_PER_INCH),
+            cell_lefts_emu, cell_tops_emu)
+
+
+# Identity of an image file on disk, used as a cache key.
+def file_key(path):
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+# Build the deck for the given slides. The key holds (path, mtime_ns, size) per
+# image, so clicking Generate again on unchanged slides returns the cached bytes.
+# Returns the .pptx bytes and messages for images that could not be added.
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_pptx(slide_groups_key):
+    # Create PPT
+    prs = Presentation()
+    # Blank layout is index 6 in the default template (same as ppt_generator.py)
+    blank_layout = prs.slide_layouts[6] if len(prs.slide_layouts) > 6 else prs.slide_layouts[0]
+
+    failures = []
+    for slide_images in slide_groups_key:
+        slide = prs.slides.add_slide(blank_layout)
+        num_imgs = len(slide_images)
+
+        # Auto grid based on number of images
+        if num_imgs <= 4:
+            rows, cols = (2, 2)
+        elif num_imgs <= 6:
+            rows, cols = (2, 3)
+        elif num_imgs <= 9:
+            rows, cols = (3, 3)
+        else:
+            rows, cols = (4, 4)
+
+        (cell_width_in, cell_height_in, cell_width_emu, cell_height_emu,
+         cell_lefts_emu, cell_tops_emu) = grid_cells(rows, cols, math.ceil(num_imgs / cols))
+
+        for idx, (img_path, mtime_ns, _) in enumerate(slide_images):
+            row = idx // cols
+            col = idx % cols
+
+            # Load image to get native dimensions (do NOT auto-rotate)
+            try:
+                orig_width_px, orig_height_px = image_meta(img_path, mtime_ns)
+
+                # Compute scale to fit image inside cell while preserving aspect ratio
+                scale = min(cell_width_in / orig_width_px, cell_height_in / orig_height_px)
+
+                new_width_in = orig_width_px * scale
+                new_height_in = orig_height_px * scale
+                new_width_emu = int(new_width_in * EMU_PER_INCH)
+                new_height_emu = int(new_height_in * EMU_PER_INCH)
+
+                # Center in cell
+                centered_left_emu = cell_lefts_emu[col] + (cell_width_emu - new_width_emu) // 2
+                centered_top_emu = cell_tops_emu[row] + (cell_height_emu - new_height_emu) // 2
+
+                # Add to slide, downscaled to the displayed size
+                embed_px = (
+                    math.ceil(new_width_in * EMBED_DPI),
+                    math.ceil(new_height_in * EMBED_DPI),
+                )
+                slide.shapes.add_picture(
+                    shrink_image(img_path, embed_px),
+                    Emu(centered_left_emu),
+                    Emu(centered_top_emu),
+                    width=Emu(new_width_emu),
+                    height=Emu(new_height_emu)
+                )
+            except Exception as e:
+                failures.append(f"{os.path.basename(img_path)} – {str(e)}")
+
+    buf = BytesIO()
+    save_pptx(prs, buf)
+    return buf.getvalue(), failures
+
+
+# Button callbacks: they run before the rerun a click triggers, so the new
+# state is rendered in that same pass without a second st.rerun().
+def add_slide(uploaded_files):
+    # Save to the session temp dir and store paths
+    temp_root = st.session_state.upload_dir.path
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        image_paths = list(ex.map(lambda f: save_upload(f, temp_root), uploaded_files))
+    st.session_state.slides.append(image_paths)
+
+
+def start_over():
+    st.session_state.slides = []
 
 # Initialize session state
 if 'slides' not in st.session_state:
     st.session_state.slides = []  # List of lists: [[img1, img2], [img3, img4], ...]
+if 'upload_dir' not in st.session_state:
+    st.session_state.upload_dir = UploadDir(upload_parent())  # One upload dir per session
 
 st.set_page_config(page_title="🪑 Inspection PPT Builder", layout="wide")
 st.title("🪑 Furniture Inspection PPT Builder")
@@ -22,8 +216,8 @@ if st.session_state.slides:
         with st.expander(f"Slide {i+1} ({len(slide_images)} image(s))"):
             cols = st.columns(min(len(slide_images), 4))
             for j, img_path in enumerate(slide_images):
-                # Show image preview using path
-                cols[j % 4].image(img_path, width=120)
+                # Show cached thumbnail; the full-res file is only used in the PPT
+                cols[j % 4].image(thumb_for(img_path, os.path.getmtime(img_path)), width=120)
 
 # Main action area
 if not st.session_state.slides:
@@ -55,17 +249,7 @@ if not st.session_state.slides or action == "Add another slide":
         
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("✅ Add This Slide"):
-                # Save to temp dir and store paths
-                temp_dir = tempfile.mkdtemp()
-                image_paths = []
-                for f in uploaded_files:
-                    path = os.path.join(temp_dir, f.name)
-                    with open(path, "wb") as fp:
-                        fp.write(f.getvalue())
-                    image_paths.append(path)
-                st.session_state.slides.append(image_paths)
-                st.rerun()
+            st.button("✅ Add This Slide", on_click=add_slide, args=(uploaded_files,))
         with col2:
             st.button("↩️ Cancel")
 
@@ -75,101 +259,20 @@ if st.session_state.slides and action == "Generate and download PPT":
         if not st.session_state.slides:
             st.error("❌ No slides to generate!")
         else:
-            # Create PPT
-            prs = Presentation()
-            # Find blank layout
-            blank_layout = None
-            for layout in prs.slide_layouts:
-                if "blank" in layout.name.lower():
-                    blank_layout = layout
-                    break
-            if blank_layout is None:
-                blank_layout = prs.slide_layouts[0]
-
-            for slide_images in st.session_state.slides:
-                slide = prs.slides.add_slide(blank_layout)
-                num_imgs = len(slide_images)
-                
-                # Auto grid based on number of images
-                if num_imgs <= 4:
-                    rows, cols = (2, 2)
-                elif num_imgs <= 6:
-                    rows, cols = (2, 3)
-                elif num_imgs <= 9:
-                    rows, cols = (3, 3)
-                else:
-                    rows, cols = (4, 4)
-                
-                # Slide usable area (in inches)
-                max_width = 15.0   # Approx full slide width
-                max_height = 7.5   # Leave room for title/footer if needed
-                img_width = max_width / cols
-                img_height = max_height / rows
-
-                for idx, img_path in enumerate(slide_images):
-                    row = idx // cols
-                    col = idx % cols
-
-                    # Cell boundaries (in inches)
-                    cell_left_in = col * img_width + 0.15
-                    cell_top_in = row * img_height + 0.3
-                    cell_width_in = img_width - 0.3
-                    cell_height_in = img_height - 0.3
-
-                    # Load image to get native dimensions (do NOT auto-rotate)
-                    try:
-                        with PILImage.open(img_path) as pil_img:
-                            # Make a copy to avoid "closed file" issues
-                            pil_img.load()  # Ensure pixels are loaded
-                            orig_width_px, orig_height_px = pil_img.size
-
-                            # Get DPI or default to 96
-                            dpi = pil_img.info.get('dpi', (96, 96))
-                            dpi_x = dpi[0] if isinstance(dpi, tuple) else dpi
-                            if dpi_x <= 1:
-                                dpi_x = 96
-
-                            # Convert pixels to inches
-                            orig_width_in = orig_width_px / dpi_x
-                            orig_height_in = orig_height_px / dpi_x
-
-                        # Compute scale to fit image inside cell while preserving aspect ratio
-                        scale_x = cell_width_in / orig_width_in
-                        scale_y = cell_height_in / orig_height_in
-                        scale = min(scale_x, scale_y)
-
-                        new_width_in = orig_width_in * scale
-                        new_height_in = orig_height_in * scale
-
-                        # Center in cell
-                        centered_left_in = cell_left_in + (cell_width_in - new_width_in) / 2
-                        centered_top_in = cell_top_in + (cell_height_in - new_height_in) / 2
-
-                        # Add to slide
-                        slide.shapes.add_picture(
-                            img_path,
-                            Inches(centered_left_in),
-                            Inches(centered_top_in),
-                            width=Inches(new_width_in),
-                            height=Inches(new_height_in)
-                        )
-                    except Exception as e:
-                        st.warning(f"⚠️ Failed to add image: {os.path.basename(img_path)} – {str(e)}")
-
-            # Save and download
-            ppt_buffer = BytesIO()
-            prs.save(ppt_buffer)
-            ppt_buffer.seek(0)
+            slide_groups_key = tuple(
+                tuple(file_key(p) for p in group) for group in st.session_state.slides
+            )
+            ppt_bytes, failures = build_pptx(slide_groups_key)
+            for failure in failures:
+                st.warning(f"⚠️ Failed to add image: {failure}")
 
             st.download_button(
                 label="⬇️ Download Inspection Report (PPTX)",
-                data=ppt_buffer,
+                data=ppt_bytes,
                 file_name="Furniture_Inspection_Report.pptx",
                 mime="application/vnd.openxmlformats-officedocument.presentationml.presentation"
             )
 
 # Reset button
 if st.session_state.slides:
-    if st.button("🔄 Start Over"):
-        st.session_state.slides = []
-        st.rerun()
+    st.button("🔄 Start Over", on_click=start_over)
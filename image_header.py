@@ -0,0 +1,59 @@
+# image_header.py — read pixel size straight from JPEG/PNG headers, without
+# handing the file to PIL (no pixel data is touched).
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Start-of-frame markers carrying the image size (DHT/JPG/DAC share the range)
+JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF,
+}
+# Markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+
+def _jpeg_size(fp):
+    while True:
+        byte = fp.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        code = fp.read(1)
+        while code == b"\xff":  # Fill bytes
+            code = fp.read(1)
+        if not code:
+            return None
+        code = code[0]
+        if code in JPEG_STANDALONE_MARKERS:
+            continue
+        if code in (0xD9, 0xDA):  # EOI / start of scan: no frame header seen
+            return None
+
+        length = struct.unpack(">H", fp.read(2))[0]
+        if code in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", fp.read(5)[1:5])
+            return width, height
+        fp.seek(length - 2, 1)
+
+
+def _png_size(fp):
+    # IHDR is always the first chunk
+    _, ctype = struct.unpack(">I4s", fp.read(8))
+    if ctype != b"IHDR":
+        return None
+    return struct.unpack(">II", fp.read(8))
+
+
+# Returns (width_px, height_px), or None when the file isn't a JPEG/PNG this
+# parser understands and the caller should fall back to PIL.
+def read_image_size(path):
+    with open(path, "rb") as fp:
+        signature = fp.read(8)
+        if signature[:2] == b"\xff\xd8":
+            fp.seek(2)
+            return _jpeg_size(fp)
+        if signature == PNG_SIGNATURE:
+            return _png_size(fp)
+    return None
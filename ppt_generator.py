@@ -1,91 +1,213 @@
 import os
 import math
+import functools
+import hashlib
+import tempfile
+import zipfile
+from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
 from pptx import Presentation
-from pptx.util import Inches
+from pptx.opc.serialized import PackageWriter, _ZipPkgWriter
+from pptx.util import Emu, Inches
 
 SLIDE_WIDTH = 1920
 SLIDE_HEIGHT = 1080
 MARGIN = 20
-
-def create_canvas(images):
-    n = len(images)
+EMU_PER_PX = Inches(13.33) / SLIDE_WIDTH
+EMBED_DPI = 150  # Resolution of pictures embedded in the PPT
+EMBED_PX_PER_PX = EMU_PER_PX / Inches(1) * EMBED_DPI
+TITLE_BOX = (Inches(0.3), Inches(0.1), Inches(12), Inches(0.5))
+CACHE_MAX_ENTRIES = 2000
+ZIP_COMPRESSLEVEL = 3  # For XML parts; media parts are stored uncompressed
+
+
+def has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+
+# An ICC profile describes one colour space; it stays valid only if conversion
+# kept the pixels in it (e.g. not CMYK -> RGB or L -> RGB)
+def same_colour_space(src_mode, dst_mode):
+    families = (("RGB", "RGBA", "P", "PA"), ("L", "LA"))
+    return any(src_mode in family and dst_mode in family for family in families)
+
+
+# Downscale an image to fit max_size pixels for embedding. Images that already
+# fit are returned as their path and embedded unchanged. Transparent images stay
+# PNG so their alpha survives; everything else is re-encoded as JPEG.
+def shrink_image(path, max_size):
+    with Image.open(path) as img:
+        if img.width <= max_size[0] and img.height <= max_size[1]:
+            return path
+
+        src_mode = img.mode
+        icc_profile = img.info.get("icc_profile")
+        buf = BytesIO()
+        if has_alpha(img):
+            img = img.convert("RGBA")
+            save_params = {"format": "PNG"}
+        else:
+            img.draft("RGB", max_size)
+            # thumbnail() rejects modes such as 16-bit "I;16", so convert first
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            save_params = {
+                "format": "JPEG", "quality": 85, "optimize": True, "progressive": True
+            }
+        if not same_colour_space(src_mode, img.mode):
+            icc_profile = None
+
+        img.thumbnail(max_size, Image.Resampling.BILINEAR)
+        img.save(buf, icc_profile=icc_profile, **save_params)
+    buf.seek(0)
+    return buf
+
+
+# Shrunk images are cached as plain <blake2b>.jpg/.png files in cache_dir
+def cached_shrink_image(cache_dir, path, max_size):
+    if cache_dir is None:
+        return shrink_image(path, max_size)
+
+    # Keyed on file identity and target size, so edited photos are re-encoded
+    stat = os.stat(path)
+    key = hashlib.blake2b(
+        f"{path}:{stat.st_mtime_ns}:{stat.st_size}:{max_size[0]}x{max_size[1]}".encode()
+    ).hexdigest()
+
+    for ext in (".jpg", ".png"):
+        cached = os.path.join(cache_dir, key + ext)
+        try:
+            with open(cached, "rb") as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            continue
+        os.utime(cached)  # Most recently used entries survive pruning
+        return BytesIO(data)
+
+    shrunk = shrink_image(path, max_size)
+    if shrunk == path:
+        return path
+
+    data = shrunk.getvalue()
+    ext = ".png" if data.startswith(b"\x89PNG") else ".jpg"
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".part", delete=False) as fp:
+        fp.write(data)
+    os.replace(fp.name, os.path.join(cache_dir, key + ext))
+    return shrunk
+
+
+def prune_cache(cache_dir, max_entries=CACHE_MAX_ENTRIES):
+    with os.scandir(cache_dir) as it:
+        entries = [e for e in it if e.is_file() and e.name.endswith((".jpg", ".png"))]
+    entries.sort(key=lambda e: e.stat().st_mtime_ns, reverse=True)
+    for entry in entries[max_entries:]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+# Zip writer for generated decks: media parts are already-compressed
+# JPEG/PNG, so they are stored as-is; XML parts get a cheap DEFLATE level.
+class FastZipPkgWriter(_ZipPkgWriter):
+    def write(self, pack_uri, blob):
+        if pack_uri.startswith("/ppt/media/"):
+            self._zipf.writestr(pack_uri.membername, blob, compress_type=zipfile.ZIP_STORED)
+        else:
+            self._zipf.writestr(pack_uri.membername, blob, compresslevel=ZIP_COMPRESSLEVEL)
+
+
+class FastPackageWriter(PackageWriter):
+    def _write(self):
+        with FastZipPkgWriter(self._pkg_file) as phys_writer:
+            self._write_content_types_stream(phys_writer)
+            self._write_pkg_rels(phys_writer)
+            self._write_parts(phys_writer)
+
+
+# Same as prs.save(target), but through FastPackageWriter; target is a path or
+# a writable binary file object
+def save_pptx(prs, target):
+    package = prs.part.package
+    FastPackageWriter.write(target, package._rels, tuple(package.iter_parts()))
+
+
+# Grid for n images: column count, cell size and cell origins in canvas pixels.
+# Folders mostly share a few image counts, so each layout is computed once.
+@functools.lru_cache(maxsize=None)
+def grid_layout(n):
     cols = math.ceil(math.sqrt(n))
     rows = math.ceil(n / cols)
 
     cell_w = (SLIDE_WIDTH - (cols + 1) * MARGIN) // cols
     cell_h = (SLIDE_HEIGHT - (rows + 1) * MARGIN) // rows
 
-    canvas = Image.new("RGB", (SLIDE_WIDTH, SLIDE_HEIGHT), "white")
+    xs = tuple(MARGIN + c * (cell_w + MARGIN) for c in range(cols))
+    ys = tuple(MARGIN + r * (cell_h + MARGIN) for r in range(rows))
+    return cols, cell_w, cell_h, xs, ys
 
-    x = y = MARGIN
-    index = 0
 
-    for r in range(rows):
-        x = MARGIN
-        for c in range(cols):
-            if index >= n:
-                break
+def place_images(slide, images, cache_dir=None):
+    cols, cell_w, cell_h, xs, ys = grid_layout(len(images))
 
-            img = Image.open(images[index]).convert("RGB")
-            img.thumbnail((cell_w, cell_h))
+    for index, path in enumerate(images):
+        r, c = divmod(index, cols)
+        x = xs[c]
+        y = ys[r]
 
-            paste_x = x + (cell_w - img.width) // 2
-            paste_y = y + (cell_h - img.height) // 2
+        with Image.open(path) as img:
+            img_w, img_h = img.size
+        scale = min(cell_w / img_w, cell_h / img_h, 1)
+        pic_w = img_w * scale
+        pic_h = img_h * scale
 
-            canvas.paste(img, (paste_x, paste_y))
-            x += cell_w + MARGIN
-            index += 1
-
-        y += cell_h + MARGIN
+        # Embed at EMBED_DPI for the displayed size, not at camera resolution
+        embed_px = (
+            math.ceil(pic_w * EMBED_PX_PER_PX),
+            math.ceil(pic_h * EMBED_PX_PER_PX),
+        )
 
-    return canvas
+        slide.shapes.add_picture(
+            cached_shrink_image(cache_dir, path, embed_px),
+            Emu(int((x + (cell_w - pic_w) / 2) * EMU_PER_PX)),
+            Emu(int((y + (cell_h - pic_h) / 2) * EMU_PER_PX)),
+            width=Emu(int(pic_w * EMU_PER_PX)),
+            height=Emu(int(pic_h * EMU_PER_PX))
+        )
 
 
-def generate_ppt(root_folder, output_path, progress_callback=None):
+def generate_ppt(root_folder, output_path, progress_callback=None, cache_dir=None):
     prs = Presentation()
     blank_layout = prs.slide_layouts[6]
 
-    folders = [
-        os.path.join(root_folder, d)
-        for d in os.listdir(root_folder)
-        if os.path.isdir(os.path.join(root_folder, d))
-    ]
+    with os.scandir(root_folder) as it:
+        folders = sorted(e.path for e in it if e.is_dir())
 
     total = len(folders)
 
+    if cache_dir:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
     for idx, folder in enumerate(folders):
-        images = [
-            os.path.join(folder, f)
-            for f in os.listdir(folder)
-            if f.lower().endswith((".jpg", ".jpeg", ".png"))
-        ]
+        with os.scandir(folder) as it:
+            images = sorted(
+                e.path for e in it
+                if e.is_file() and e.name.lower().endswith((".jpg", ".jpeg", ".png"))
+            )
 
         if not images:
             continue
 
-        canvas = create_canvas(images)
-
-        temp_img = "temp_slide.jpg"
-        canvas.save(temp_img, quality=85)
-
         slide = prs.slides.add_slide(blank_layout)
+        place_images(slide, images, cache_dir)
 
-        slide.shapes.add_picture(
-            temp_img,
-            Inches(0),
-            Inches(0),
-            width=Inches(13.33)
-        )
-
-        title_box = slide.shapes.add_textbox(
-            Inches(0.3), Inches(0.1), Inches(12), Inches(0.5)
-        )
+        title_box = slide.shapes.add_textbox(*TITLE_BOX)
         title_box.text_frame.text = os.path.basename(folder)
 
         if progress_callback:
             progress_callback(int((idx + 1) / total * 100))
 
-        os.remove(temp_img)
+    if cache_dir:
+        prune_cache(cache_dir)
 
-    prs.save(output_path)
+    save_pptx(prs, output_path)
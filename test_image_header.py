@@ -0,0 +1,63 @@
+import struct
+
+import pytest
+from PIL import Image
+
+from image_header import read_image_size
+
+JPEG_CASES = {
+    "baseline": {},
+    "progressive": {"progressive": True},
+    "exif": {"exif": Image.Exif().tobytes()},
+    "grayscale": {"mode": "L"},
+}
+
+PNG_CASES = {
+    "rgb": ("RGB", {}),
+    "rgb_phys": ("RGB", {"dpi": (150, 150)}),
+    "rgba": ("RGBA", {}),
+}
+
+
+@pytest.mark.parametrize("params", JPEG_CASES.values(), ids=JPEG_CASES.keys())
+def test_jpeg_size_matches_pil(tmp_path, params):
+    params = dict(params)
+    path = tmp_path / "image.jpg"
+    Image.new(params.pop("mode", "RGB"), (640, 480)).save(path, **params)
+
+    with Image.open(path) as img:
+        assert read_image_size(path) == img.size
+
+
+@pytest.mark.parametrize("mode, params", PNG_CASES.values(), ids=PNG_CASES.keys())
+def test_png_size_matches_pil(tmp_path, mode, params):
+    path = tmp_path / "image.png"
+    Image.new(mode, (33, 77)).save(path, **params)
+
+    with Image.open(path) as img:
+        assert read_image_size(path) == img.size
+
+
+@pytest.mark.parametrize("suffix, keep", [(".jpg", 4), (".png", 12)])
+def test_truncated_header_raises_struct_error(tmp_path, suffix, keep):
+    # image_meta() in app.py catches struct.error and falls back to PIL
+    path = tmp_path / ("image" + suffix)
+    Image.new("RGB", (640, 480)).save(path)
+    path.write_bytes(path.read_bytes()[:keep])
+
+    with pytest.raises(struct.error):
+        read_image_size(path)
+
+
+def test_jpeg_without_frame_header_before_scan(tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(b"\xff\xd8\xff\xda\x00\x08\x01\x01\x00\x00\x3f\x00\xff\xd9")
+
+    assert read_image_size(path) is None
+
+
+def test_other_formats_fall_back(tmp_path):
+    path = tmp_path / "image.gif"
+    Image.new("RGB", (10, 10)).save(path)
+
+    assert read_image_size(path) is None
@@ -0,0 +1,78 @@
+import zipfile
+
+from PIL import Image, ImageCms
+from pptx import Presentation
+
+from ppt_generator import generate_ppt, shrink_image
+
+SRGB_PROFILE = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+
+
+def test_image_that_fits_is_returned_unchanged(tmp_path):
+    path = tmp_path / "small.png"
+    Image.new("RGB", (100, 100), "blue").save(path)
+
+    assert shrink_image(path, (200, 200)) == path
+
+
+def test_large_photo_is_downscaled_to_jpeg(tmp_path):
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (4000, 3000), "blue").save(path)
+
+    with Image.open(shrink_image(path, (200, 200))) as img:
+        assert img.format == "JPEG"
+        assert img.size == (200, 150)
+
+
+def test_alpha_is_preserved(tmp_path):
+    path = tmp_path / "transparent.png"
+    Image.new("RGBA", (800, 600), (0, 0, 0, 0)).save(path)
+
+    with Image.open(shrink_image(path, (200, 200))) as img:
+        assert img.format == "PNG"
+        assert img.mode == "RGBA"
+        assert img.getpixel((5, 5)) == (0, 0, 0, 0)
+
+
+def test_16_bit_png(tmp_path):
+    path = tmp_path / "depth16.png"
+    Image.new("I;16", (800, 600)).save(path)
+
+    with Image.open(shrink_image(path, (200, 200))) as img:
+        assert img.format == "JPEG"
+        assert img.size == (200, 150)
+
+
+def test_icc_profile_is_kept(tmp_path):
+    jpeg = tmp_path / "tagged.jpg"
+    png = tmp_path / "tagged.png"
+    Image.new("RGB", (800, 600)).save(jpeg, icc_profile=SRGB_PROFILE)
+    Image.new("RGBA", (800, 600)).save(png, icc_profile=SRGB_PROFILE)
+
+    for path in (jpeg, png):
+        with Image.open(shrink_image(path, (200, 200))) as img:
+            assert img.info.get("icc_profile") == SRGB_PROFILE
+
+
+def test_icc_profile_is_dropped_after_colour_space_change(tmp_path):
+    path = tmp_path / "cmyk.jpg"
+    Image.new("CMYK", (800, 600)).save(path, icc_profile=SRGB_PROFILE)
+
+    with Image.open(shrink_image(path, (200, 200))) as img:
+        assert img.mode == "RGB"
+        assert "icc_profile" not in img.info
+
+
+def test_generated_deck_stores_media_uncompressed(tmp_path):
+    folder = tmp_path / "photos" / "Chair"
+    folder.mkdir(parents=True)
+    Image.new("RGB", (4000, 3000), "blue").save(folder / "front.jpg")
+    output = tmp_path / "report.pptx"
+
+    generate_ppt(tmp_path / "photos", output)
+
+    with zipfile.ZipFile(output) as pptx:
+        for info in pptx.infolist():
+            expected = zipfile.ZIP_STORED if info.filename.startswith("ppt/media/") else zipfile.ZIP_DEFLATED
+            assert info.compress_type == expected
+    assert len(Presentation(output).slides) == 1